@@ -1,56 +1,242 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
 from config import (
-    INVOICE_DATE_COL,
     COUNTRY_COL,
     CUSTOMER_ID_COL,
     DESCRIPTION_COL,
+    USE_POLARS,
 )
 from anomaly_detector import detect_revenue_anomalies_iforest
+from columns import TxnColumns, encode_column
 
-@st.cache_data
-def aggregate_weekly_revenue(df: pd.DataFrame) -> pd.DataFrame:
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+
+if numba is not None:
+    from numba import types
+
+    # One fixed signature with read-only inputs: writable arrays convert to it
+    # too, so copy-on-write arrays never trigger a second specialization.
+    # cache=True stores the compiled kernel on disk, so only the first process
+    # ever pays the compile time.
+    _SUM_BY_WEEK_SIG = types.Tuple((types.float64[::1], types.int64[::1]))(
+        types.Array(types.int32, 1, "C", readonly=True),
+        types.Array(types.float32, 1, "C", readonly=True),
+        types.int64,
+        types.int64,
+        types.int64,
+    )
+
+    @numba.njit(_SUM_BY_WEEK_SIG, parallel=True, fastmath=True, cache=True)
+    def _sum_by_week(days, rev, first_week, n_weeks, n_chunks):
+        """
+        Buckets rows into Monday-start weeks and sums ``rev`` per week.
+
+        ``days`` are days since the epoch and week ``w`` covers the dense range
+        ``first_week .. first_week + n_weeks - 1``. Each thread accumulates a
+        contiguous chunk of rows into its own row of partial sums and counts,
+        which are reduced at the end.
+        """
+        chunk = (rev.size + n_chunks - 1) // n_chunks
+        partial_sums = np.zeros((n_chunks, n_weeks))
+        partial_counts = np.zeros((n_chunks, n_weeks), dtype=np.int64)
+        for c in numba.prange(n_chunks):
+            for i in range(c * chunk, min((c + 1) * chunk, rev.size)):
+                # 1970-01-01 was a Thursday; shift by 3 days so weeks start on Monday.
+                w = (days[i] + 3) // 7 - first_week
+                partial_sums[c, w] += rev[i]
+                partial_counts[c, w] += 1
+        sums = np.zeros(n_weeks)
+        counts = np.zeros(n_weeks, dtype=np.int64)
+        for c in range(n_chunks):
+            sums += partial_sums[c]
+            counts += partial_counts[c]
+        return sums, counts
+
+
+def _weekly_revenue_numba(days: np.ndarray, revenue: np.ndarray) -> pd.DataFrame:
+    """
+    Numba implementation of the weekly revenue aggregation.
+
+    Args:
+        days (np.ndarray): Transaction dates as int32 days since the epoch.
+        revenue (np.ndarray): Revenue per transaction as float32, without
+            missing values. Weekly sums are accumulated in float64.
+
+    Returns:
+        pd.DataFrame: DataFrame with columns ["Date", "Revenue"] for each week.
+    """
+    if days.size == 0:
+        return pd.DataFrame({
+            "Date": np.array([], dtype="datetime64[ns]"),
+            "Revenue": np.array([], dtype=np.float64),
+        })
+
+    first_week = (int(days.min()) + 3) // 7
+    n_weeks = (int(days.max()) + 3) // 7 - first_week + 1
+    sums, counts = _sum_by_week(
+        np.ascontiguousarray(days, dtype=np.int32),
+        np.ascontiguousarray(revenue, dtype=np.float32),
+        first_week,
+        n_weeks,
+        numba.get_num_threads(),
+    )
+
+    # Only report weeks that had transactions, as the pandas groupby does.
+    weeks = np.flatnonzero(counts) + first_week
+    return pd.DataFrame({
+        "Date": (weeks * 7 - 3).astype("datetime64[D]").astype("datetime64[ns]"),
+        "Revenue": sums[counts > 0],
+    })
+
+
+def _weekly_revenue_polars(cols: TxnColumns) -> pd.DataFrame:
+    """
+    Polars implementation of the weekly revenue aggregation.
+
+    Args:
+        cols (TxnColumns): Transaction columns.
+
+    Returns:
+        pd.DataFrame: DataFrame with columns ["Date", "Revenue"] for each week.
+    """
+    weekly = (
+        pl.DataFrame({"Date": cols.date, "Revenue": cols.revenue})
+        .lazy()
+        .group_by(pl.col("Date").dt.truncate("1w"))
+        .agg(pl.col("Revenue").cast(pl.Float64).sum())
+        .sort("Date")
+        .collect()
+        .to_pandas()
+    )
+    weekly["Date"] = pd.to_datetime(weekly["Date"]).astype("datetime64[ns]")
+    return weekly
+
+
+def aggregate_weekly_revenue(cols: TxnColumns) -> pd.DataFrame:
     """
     Aggregates revenue by calendar week.
 
     Args:
-        df (pd.DataFrame): DataFrame containing transaction data.
+        cols (TxnColumns): Transaction columns.
 
     Returns:
         pd.DataFrame: DataFrame with columns ["Date", "Revenue"] for each week.
     """
-    dates = pd.to_datetime(df[INVOICE_DATE_COL])
+    if USE_POLARS and pl is not None:
+        return _weekly_revenue_polars(cols)
+
+    days = cols.date.astype(np.int64).astype(np.int32)
+    if numba is not None and not np.isnan(cols.revenue).any():
+        return _weekly_revenue_numba(days, cols.revenue)
+
+    # Floor each day to the Monday of its week (1970-01-01 was a Thursday).
+    week_start = (days - (days + 3) % 7).astype("datetime64[D]")
     weekly = (
-        df.assign(Week=dates.dt.to_period("W").apply(lambda r: r.start_time))
-        .groupby("Week")["Revenue"]
+        pd.Series(cols.revenue.astype(np.float64), name="Revenue")
+        .groupby(week_start)
         .sum()
+        .rename_axis("Date")
         .reset_index()
-        .rename(columns={"Week": "Date"})
     )
-    weekly["Date"] = pd.to_datetime(weekly["Date"])
+    weekly["Date"] = pd.to_datetime(weekly["Date"]).astype("datetime64[ns]")
     return weekly
 
 
-def compute_core_kpis(df: pd.DataFrame) -> dict:
+def _topn(codes, levels, rev: np.ndarray, name: str, n: int = 10):
+    """
+    Sums revenue per group code and keeps the top ``n`` groups.
+
+    Groups are summed with a single ``np.bincount`` over the integer codes,
+    then the top ``n`` are picked with ``np.argpartition`` and only those are
+    sorted.
+
+    Args:
+        codes (np.ndarray | None): int32 group code per row, -1 for missing.
+        levels (pd.Index | None): Group value for each code.
+        rev (np.ndarray): Revenue per row.
+        name (str): Name for the resulting index, e.g. the column name.
+        n (int): Number of groups to keep.
+
+    Returns:
+        pd.Series | None: Revenue per group in descending order, named
+                          "Revenue" and indexed by the group values, or None
+                          if ``codes`` is None.
+    """
+    if codes is None:
+        return None
+
+    # Missing keys have code -1; drop them as groupby does.
+    valid = codes >= 0
+    codes, rev = codes[valid], rev[valid]
+    sums = np.bincount(codes, weights=rev, minlength=len(levels))
+    # Keep only groups that occur, so unused categories never rank.
+    observed = np.flatnonzero(np.bincount(codes, minlength=len(levels)))
+    vals = sums[observed].astype(np.float64, copy=False)
+
+    k = min(n, vals.size)
+    idx = np.argpartition(vals, -k)[-k:] if k else np.array([], dtype=np.intp)
+    idx = idx[np.argsort(vals[idx])[::-1]]
+    return pd.Series(
+        vals[idx],
+        index=pd.Index(levels[observed[idx]], name=name),
+        name="Revenue",
+    )
+
+
+def _top_countries(cols: TxnColumns, n: int = 10):
+    """Top ``n`` countries by revenue, or None without a country column."""
+    return _topn(cols.country_codes, cols.country_levels, cols.revenue, COUNTRY_COL, n)
+
+
+def _top_products(cols: TxnColumns, n: int = 10):
+    """Top ``n`` products by revenue, or None without a description column."""
+    return _topn(
+        cols.description_codes, cols.description_levels, cols.revenue, DESCRIPTION_COL, n
+    )
+
+
+def compute_core_kpis(
+    df: pd.DataFrame,
+    revenue_by_country=None,
+    revenue_by_product=None,
+) -> dict:
     """
     Computes core KPIs from transaction data.
 
     Args:
         df (pd.DataFrame): DataFrame containing transaction data.
+        revenue_by_country (pd.Series, optional): Precomputed revenue per
+            country in descending order. Computed from ``df`` if omitted.
+        revenue_by_product (pd.Series, optional): Precomputed revenue per
+            product in descending order. Computed from ``df`` if omitted.
 
     Returns:
         dict: Dictionary of KPIs including total revenue, transactions, AOV,
               top country/product, and unique customers.
     """
-    total_revenue = df["Revenue"].sum()
-    num_transactions = df["Revenue"].count()
+    # Scan Revenue once; it has no missing values after load_transactions,
+    # so every row is a transaction.
+    rev = df["Revenue"].to_numpy()
+    total_revenue = rev.sum(dtype=np.float64)
+    num_transactions = rev.size
     avg_order_value = total_revenue / num_transactions if num_transactions else 0.0
 
     # Top country by revenue
-    if COUNTRY_COL in df.columns:
-        revenue_by_country = (
-            df.groupby(COUNTRY_COL)["Revenue"].sum().sort_values(ascending=False)
-        )
+    # Encode only the key column when called standalone; the dates and
+    # the other dimension are not needed for a single top entry.
+    if revenue_by_country is None:
+        revenue_by_country = _topn(*encode_column(df, COUNTRY_COL), rev, COUNTRY_COL)
+    if revenue_by_country is not None and not revenue_by_country.empty:
         top_country = revenue_by_country.index[0]
         top_country_revenue = revenue_by_country.iloc[0]
     else:
@@ -58,12 +244,13 @@ def compute_core_kpis(df: pd.DataFrame) -> dict:
         top_country_revenue = None
 
     # Top product by revenue
-    if DESCRIPTION_COL in df.columns:
-        product_revenue = (
-            df.groupby(DESCRIPTION_COL)["Revenue"].sum().sort_values(ascending=False)
+    if revenue_by_product is None:
+        revenue_by_product = _topn(
+            *encode_column(df, DESCRIPTION_COL), rev, DESCRIPTION_COL
         )
-        top_product = product_revenue.index[0]
-        top_product_revenue = product_revenue.iloc[0]
+    if revenue_by_product is not None and not revenue_by_product.empty:
+        top_product = revenue_by_product.index[0]
+        top_product_revenue = revenue_by_product.iloc[0]
     else:
         top_product = None
         top_product_revenue = None
@@ -86,56 +273,95 @@ def compute_core_kpis(df: pd.DataFrame) -> dict:
     }
 
 @st.cache_data
-def build_summary(df: pd.DataFrame, contamination) -> dict:
+def _summarize_transactions(_df: pd.DataFrame, cache_key: str) -> dict:
     """
-    Builds a summary dictionary for downstream analysis.
+    Computes the parts of the summary that do not depend on contamination.
 
-    Includes KPIs, recent weekly trends, detected anomalies,
-    and top N dataframes for charting.
+    Cached per file, so moving the contamination slider only re-runs the
+    anomaly detection on the weekly series.
 
     Args:
-        df (pd.DataFrame): DataFrame containing transaction data.
-        contamination (float): Contamination factor for anomaly detection.
+        _df (pd.DataFrame): DataFrame containing transaction data. Not hashed
+            by Streamlit; ``cache_key`` identifies its content instead.
+        cache_key (str): Content digest of the uploaded file behind ``_df``.
 
     Returns:
-        dict: Summary dictionary with keys "core_kpis", "recent_trend",
-              "anomalies", "top_products_df", "top_countries_df".
+        dict: Dictionary with keys "core_kpis", "recent_trend", "weekly_df",
+              "top_products_df", "top_countries_df".
     """
-    weekly = aggregate_weekly_revenue(df)
-    core_kpis = compute_core_kpis(df)
+    # Run the aggregations on plain arrays rather than DataFrame columns.
+    cols = TxnColumns.from_dataframe(_df)
+    weekly = aggregate_weekly_revenue(cols)
+
+    # Group once per dimension; the same sums feed the KPIs and the Top 10 charts.
+    revenue_by_country = _top_countries(cols)
+    revenue_by_product = _top_products(cols)
+    core_kpis = compute_core_kpis(
+        _df,
+        revenue_by_country=revenue_by_country,
+        revenue_by_product=revenue_by_product,
+    )
 
     # Last 8 week revenue for simple trend
     recent_trend = weekly.tail(8).to_dict(orient="records")
 
-    # Anomaly detection
-    anomalies_df = detect_revenue_anomalies_iforest(weekly, contamination=contamination)
-    anomalies = anomalies_df.to_dict(orient="records")
-
-    # Generate Top 10 Products DataFrame for charting
+    # Top 10 Products DataFrame for charting
     top_products_df = pd.DataFrame()
-    if DESCRIPTION_COL in df.columns:
-        top_products_df = (
-            df.groupby(DESCRIPTION_COL)["Revenue"]
-            .sum()
-            .nlargest(10)
-            .reset_index()
-        )
+    if revenue_by_product is not None:
+        top_products_df = revenue_by_product.reset_index()
 
-    # Generate Top 10 Countries DataFrame for charting
+    # Top 10 Countries DataFrame for charting
     top_countries_df = pd.DataFrame()
-    if COUNTRY_COL in df.columns:
-        top_countries_df = (
-            df.groupby(COUNTRY_COL)["Revenue"]
-            .sum()
-            .nlargest(10)
-            .reset_index()
-        )
+    if revenue_by_country is not None:
+        top_countries_df = revenue_by_country.reset_index()
 
-    summary = {
+    return {
         "core_kpis": core_kpis,
         "recent_trend": recent_trend,
-        "anomalies": anomalies,
+        "weekly_df": weekly,
         "top_products_df": top_products_df,
         "top_countries_df": top_countries_df,
     }
+
+
+@st.cache_data
+def build_summary(_df: pd.DataFrame, contamination, cache_key: str) -> dict:
+    """
+    Builds a summary dictionary for downstream analysis.
+
+    Includes KPIs, recent weekly trends, detected anomalies,
+    and top N dataframes for charting.
+
+    Args:
+        _df (pd.DataFrame): DataFrame containing transaction data. Not hashed
+            by Streamlit; ``cache_key`` identifies its content instead.
+        contamination (float): Contamination factor for anomaly detection.
+        cache_key (str): Content digest of the uploaded file behind ``_df``.
+
+    Returns:
+        dict: Summary dictionary with keys "core_kpis", "recent_trend",
+              "anomalies", "anomalies_str_dates", "weekly_df",
+              "top_products_df", "top_countries_df".
+    """
+    base = _summarize_transactions(_df, cache_key)
+
+    # Anomaly detection
+    anomalies_df = detect_revenue_anomalies_iforest(
+        base["weekly_df"], contamination=contamination
+    )
+    anomalies = anomalies_df.to_dict(orient="records")
+    # Chart-ready dates, formatted once here rather than on every rerun.
+    anomalies_str_dates = np.datetime_as_string(
+        anomalies_df["Date"].to_numpy().astype("datetime64[D]"), unit="D"
+    ).tolist()
+
+    summary = {
+        "core_kpis": base["core_kpis"],
+        "recent_trend": base["recent_trend"],
+        "anomalies": anomalies,
+        "anomalies_str_dates": anomalies_str_dates,
+        "weekly_df": base["weekly_df"],
+        "top_products_df": base["top_products_df"],
+        "top_countries_df": base["top_countries_df"],
+    }
     return summary
\ No newline at end of file
@@ -1,34 +1,110 @@
 import pandas as pd
 from sklearn.ensemble import IsolationForest
 import numpy as np
+import streamlit as st
+from config import ANOMALY_MIN_IFOREST_WEEKS, ANOMALY_Z_THRESHOLD
 
 
-def detect_revenue_anomalies_iforest(weekly_df, contamination=0.01):
+def _mad_detector(weekly_df, contamination=0.01):
     """
-    Detects revenue anomalies in weekly aggregated data using Isolation Forest.
+    Detects revenue anomalies with a robust z-score based on the median
+    absolute deviation (MAD), or the mean absolute deviation if the MAD is 0.
+
+    A week is flagged if its robust z-score reaches ANOMALY_Z_THRESHOLD and it
+    is among the ``contamination`` fraction of most extreme weeks. Scores
+    follow the Isolation Forest convention: negative for anomalies, from 0
+    at the threshold towards -1 for the most extreme deviations.
 
     Args:
         weekly_df (pd.DataFrame): DataFrame with columns ["Date", "Revenue"].
-        contamination (float): Expected fraction of outliers (default 0.1).
+        contamination (float): Maximum fraction of weeks to flag.
 
     Returns:
         pd.DataFrame: DataFrame containing detected anomalies with columns
                       ["Date", "Revenue", "anomaly_score"].
     """
-    df = weekly_df.copy().sort_values("Date").reset_index(drop=True)
-    X = df[["Revenue"]].values  # feature matrix
+    rev = weekly_df["Revenue"].to_numpy(dtype=np.float64)
+    deviation = np.abs(rev - np.median(rev))
+    mad = np.median(deviation)
+    if mad > 0:
+        scale = 1.4826 * mad
+    else:
+        # More than half the weeks sit exactly on the median, e.g. a flat
+        # series with a single spike. Fall back to the mean absolute deviation
+        # so the spike is still scored.
+        scale = 1.2533 * deviation.mean()
+    if scale == 0:
+        # Every week equals the median; there is nothing to flag.
+        return weekly_df.iloc[:0][["Date", "Revenue"]].assign(anomaly_score=[])
+
+    z = deviation / scale
+    n_max = int(np.ceil(contamination * len(rev)))
+    is_anomaly = np.zeros(len(rev), dtype=bool)
+    is_anomaly[np.argsort(z)[::-1][:n_max]] = True
+    is_anomaly &= z >= ANOMALY_Z_THRESHOLD
+
+    return weekly_df.loc[is_anomaly, ["Date", "Revenue"]].assign(
+        anomaly_score=ANOMALY_Z_THRESHOLD / z[is_anomaly] - 1
+    )
+
+
+@st.cache_data
+def _iforest_scores(rev_bytes: bytes) -> np.ndarray:
+    """
+    Fits an Isolation Forest on weekly revenue and scores the same weeks.
+
+    The trees do not depend on the contamination rate, which only sets the
+    score threshold, so the scores are cached on the raw bytes and
+    sensitivity changes skip both fitting and scoring. The model itself is
+    not kept once the scores are computed.
+
+    Args:
+        rev_bytes (bytes): Weekly revenue as a float32 array.
 
-    # Fit Isolation Forest
+    Returns:
+        np.ndarray: score_samples output for each week.
+    """
+    X = np.frombuffer(rev_bytes, dtype=np.float32).reshape(-1, 1)
+    # Weekly series have at most a few hundred points, so a small forest on
+    # small subsamples is enough.
     model = IsolationForest(
-        contamination=contamination,
         random_state=42,
-        n_estimators=200
+        n_estimators=50,
+        max_samples=min(128, len(X)),
+        n_jobs=-1,
     )
-    model.fit(X)
+    return model.fit(X).score_samples(X)
+
 
-    # Predict anomalies: -1 = anomaly, 1 = normal
-    df["anomaly_flag"] = model.predict(X)
-    df["anomaly_score"] = model.decision_function(X)
+def detect_revenue_anomalies_iforest(weekly_df, contamination=0.01):
+    """
+    Detects revenue anomalies in weekly aggregated data using Isolation Forest.
+
+    Series shorter than ANOMALY_MIN_IFOREST_WEEKS are handled by a robust
+    z-score detector instead, which needs no model fit.
+
+    Args:
+        weekly_df (pd.DataFrame): DataFrame with columns ["Date", "Revenue"].
+        contamination (float): Expected fraction of outliers (default 0.1).
 
-    anomalies = df[df["anomaly_flag"] == -1]
-    return anomalies[["Date", "Revenue", "anomaly_score"]]
+    Returns:
+        pd.DataFrame: DataFrame containing detected anomalies with columns
+                      ["Date", "Revenue", "anomaly_score"].
+    """
+    if len(weekly_df) < ANOMALY_MIN_IFOREST_WEEKS:
+        return _mad_detector(weekly_df, contamination)
+
+    # weekly_df is already in date order from aggregate_weekly_revenue.
+    # IsolationForest works in float32 internally, so build the features in it.
+    X = weekly_df["Revenue"].to_numpy(dtype=np.float32).reshape(-1, 1)
+
+    # Flag the lowest `contamination` fraction of the cached scores. This is
+    # the threshold fit() stores as offset_, so scores match decision_function
+    # and negative scores are what predict reports as anomalies (-1).
+    raw_scores = _iforest_scores(X.tobytes())
+    scores = raw_scores - np.percentile(raw_scores, 100.0 * contamination)
+
+    is_anomaly = scores < 0
+    return weekly_df.loc[is_anomaly, ["Date", "Revenue"]].assign(
+        anomaly_score=scores[is_anomaly]
+    )
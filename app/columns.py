@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+import pandas as pd
+from config import INVOICE_DATE_COL, COUNTRY_COL, DESCRIPTION_COL
+
+
+def encode_column(df: pd.DataFrame, col: str):
+    """
+    Returns int32 codes (-1 for missing) and their levels for ``df[col]``.
+
+    Categorical columns reuse their existing codes; other dtypes are
+    factorized. Returns (None, None) if ``col`` is not present.
+    """
+    if col not in df.columns:
+        return None, None
+    values = df[col]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.int32), values.cat.categories
+    codes, levels = pd.factorize(values, sort=False)
+    return codes.astype(np.int32), pd.Index(levels)
+
+
+@dataclass
+class TxnColumns:
+    """
+    Transaction columns as standalone arrays for the analysis kernels.
+
+    Attributes:
+        date (np.ndarray): Transaction dates as datetime64[D].
+        revenue (np.ndarray): Revenue per transaction as float32.
+        country_codes (np.ndarray | None): int32 codes into ``country_levels``,
+            -1 for missing values. None if the data has no country column.
+        description_codes (np.ndarray | None): int32 codes into
+            ``description_levels``, -1 for missing values. None if the data
+            has no description column.
+        country_levels (pd.Index | None): Country value for each code.
+        description_levels (pd.Index | None): Product description for each code.
+    """
+    date: np.ndarray
+    revenue: np.ndarray
+    country_codes: Optional[np.ndarray] = None
+    description_codes: Optional[np.ndarray] = None
+    country_levels: Optional[pd.Index] = None
+    description_levels: Optional[pd.Index] = None
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "TxnColumns":
+        """
+        Extracts the analysis columns from a cleaned transactions DataFrame.
+
+        Args:
+            df (pd.DataFrame): DataFrame returned by load_transactions.
+
+        Returns:
+            TxnColumns: Arrays for dates, revenue, countries and products.
+        """
+        country_codes, country_levels = encode_column(df, COUNTRY_COL)
+        description_codes, description_levels = encode_column(df, DESCRIPTION_COL)
+        return cls(
+            date=pd.to_datetime(df[INVOICE_DATE_COL]).to_numpy().astype("datetime64[D]"),
+            revenue=df["Revenue"].to_numpy(dtype=np.float32),
+            country_codes=country_codes,
+            description_codes=description_codes,
+            country_levels=country_levels,
+            description_levels=description_levels,
+        )
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 import streamlit as st
 
@@ -14,9 +15,22 @@ COUNTRY_COL = "Country"
 CUSTOMER_ID_COL = "CustomerID"
 DESCRIPTION_COL = "Description"
 
-# # Anomaly detection configuration
-# ANOMALY_ROLLING_WINDOW_WEEKS = 3
-# ANOMALY_Z_THRESHOLD = 2.0  # |z| >= 2 means anomaly
+# Anomaly detection configuration
+# Weekly series shorter than this use a robust z-score (MAD) detector
+# instead of Isolation Forest.
+ANOMALY_MIN_IFOREST_WEEKS = 200
+ANOMALY_Z_THRESHOLD = 3.0  # |robust z| >= 3 means anomaly
+
+# Optional Polars backend for CSV loading and weekly aggregation
+USE_POLARS = os.getenv("USE_POLARS", "false").lower() == "true"
+
+# Cleaned uploads are kept as Arrow files in this directory so each file is
+# only parsed once; the least recently used files beyond the limit are deleted.
+TRANSACTIONS_CACHE_DIR = os.getenv(
+    "TRANSACTIONS_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "revenue_dashboard_cache"),
+)
+TRANSACTIONS_CACHE_MAX_FILES = int(os.getenv("TRANSACTIONS_CACHE_MAX_FILES", "4"))
 
 # General app settings
 APP_TITLE = "Revenue Intelligence Dashboard"
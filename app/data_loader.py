@@ -1,6 +1,64 @@
+import io
+import os
+import tempfile
+import numpy as np
 import pandas as pd
-import streamlit as st
-from config import INVOICE_DATE_COL, QUANTITY_COL, UNIT_PRICE_COL
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+from config import (
+    INVOICE_DATE_COL,
+    QUANTITY_COL,
+    UNIT_PRICE_COL,
+    COUNTRY_COL,
+    CUSTOMER_ID_COL,
+    DESCRIPTION_COL,
+    USE_POLARS,
+    TRANSACTIONS_CACHE_DIR,
+    TRANSACTIONS_CACHE_MAX_FILES,
+)
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+# Column types applied by the Arrow CSV reader at parse time.
+_CSV_COLUMN_TYPES = {
+    INVOICE_DATE_COL: pa.timestamp("ns"),
+    QUANTITY_COL: pa.int32(),
+    UNIT_PRICE_COL: pa.float64(),
+    COUNTRY_COL: pa.dictionary(pa.int32(), pa.string()),
+    DESCRIPTION_COL: pa.dictionary(pa.int32(), pa.string()),
+}
+_CSV_TIMESTAMP_FORMATS = ["%m/%d/%Y %H:%M", pa_csv.ISO8601]
+
+# Bump whenever the cleaned frame changes (columns, dtypes, cleaning rules) so
+# Arrow cache files written by older code are never served.
+_CACHE_FORMAT_VERSION = 3
+
+
+def _read_csv(uploaded_file) -> pd.DataFrame:
+    """
+    Reads a CSV file with the multithreaded Arrow reader.
+
+    Falls back to the pandas reader if the file does not match the expected
+    schema (e.g. an unrecognized date format), where cleaning coerces values.
+    """
+    try:
+        table = pa_csv.read_csv(
+            uploaded_file,
+            read_options=pa_csv.ReadOptions(encoding="latin1"),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=_CSV_COLUMN_TYPES,
+                timestamp_parsers=_CSV_TIMESTAMP_FORMATS,
+                strings_can_be_null=True,
+            ),
+        )
+    except pa.ArrowInvalid:
+        uploaded_file.seek(0)
+        return pd.read_csv(uploaded_file, encoding="latin1", low_memory=False)
+    return table.to_pandas()
 
 
 def _read_any_file(uploaded_file):
@@ -9,40 +67,190 @@ def _read_any_file(uploaded_file):
     """
     name = uploaded_file.name.lower()
     if name.endswith(".csv"):
-        return pd.read_csv(uploaded_file, encoding="latin1", low_memory=False)
+        return _read_csv(uploaded_file)
     elif name.endswith(".xlsx") or name.endswith(".xls"):
         return pd.read_excel(uploaded_file)
     else:
         raise ValueError("Unsupported file type. Please upload CSV or Excel.")
 
 
-@st.cache_data
-def load_transactions(uploaded_file) -> pd.DataFrame:
+def _load_csv_polars(uploaded_file) -> pd.DataFrame:
     """
-    Loads and lightly cleans an e-commerce transactions dataset.
+    Reads and cleans a CSV file in a single lazy Polars plan.
 
-    Wrapped with @st.cache_data to ensure the file is only loaded
-    and processed once.
+    Only the final, cleaned frame is converted to pandas.
     """
-    df = _read_any_file(uploaded_file)
+    # Polars only reads UTF-8, while the source data is latin1.
+    raw = uploaded_file.getvalue().decode("latin1").encode("utf-8")
+    # Scan every column as text and cast the ones the analysis relies on, so
+    # parsing, filtering and the revenue column run as one query at collect().
+    lf = pl.scan_csv(io.BytesIO(raw), infer_schema_length=0)
+    columns = lf.collect_schema().names()
+    if INVOICE_DATE_COL not in columns:
+        raise ValueError(f"Expected column '{INVOICE_DATE_COL}' not found in file.")
+    float_cols = [col for col in (UNIT_PRICE_COL, CUSTOMER_ID_COL) if col in columns]
+
+    # Match the dtypes of the Arrow reader (_CSV_COLUMN_TYPES), so both
+    # backends return, and cache, the same schema.
+    dates = pl.col(INVOICE_DATE_COL)
+    return (
+        lf.with_columns(
+            pl.coalesce(
+                dates.str.to_datetime(_CSV_TIMESTAMP_FORMATS[0], strict=False),
+                dates.str.to_datetime(strict=False),
+            ).cast(pl.Datetime("ns")),
+            pl.col(QUANTITY_COL).cast(pl.Int32, strict=False),
+            pl.col(float_cols).cast(pl.Float64, strict=False),
+        )
+        .drop_nulls([INVOICE_DATE_COL, QUANTITY_COL, UNIT_PRICE_COL])
+        .with_columns(
+            (pl.col(QUANTITY_COL) * pl.col(UNIT_PRICE_COL)).cast(pl.Float32).alias("Revenue")
+        )
+        .collect()
+        .to_pandas()
+    )
 
-    # Basic cleaning
+
+def _clean_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parses dates and numbers, drops incomplete rows and computes revenue.
+    """
     if INVOICE_DATE_COL not in df.columns:
         raise ValueError(f"Expected column '{INVOICE_DATE_COL}' not found in file.")
 
+    # CSV columns arrive typed from the Arrow reader; these coercions only do
+    # work for Excel files and the pandas CSV fallback.
     df[INVOICE_DATE_COL] = pd.to_datetime(df[INVOICE_DATE_COL], errors="coerce")
-    df = df.dropna(subset=[INVOICE_DATE_COL])
 
     # Ensure numeric
     for col in [QUANTITY_COL, UNIT_PRICE_COL]:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce")
-    df = df.dropna(subset=[QUANTITY_COL, UNIT_PRICE_COL])
 
-    # Compute revenue
-    df["Revenue"] = df[QUANTITY_COL] * df[UNIT_PRICE_COL]
+    # Drop rows missing a date, quantity or price with a single filter pass.
+    mask = (
+        df[INVOICE_DATE_COL].notna()
+        & df[QUANTITY_COL].notna()
+        & df[UNIT_PRICE_COL].notna()
+    )
+    df = df.loc[mask].reset_index(drop=True)
+
+    # Compute revenue on the raw arrays; the rows are already aligned.
+    # Multiply in float64 as the Polars path does, then store float32, which
+    # halves the bytes every analysis pass scans; totals are accumulated in
+    # float64 downstream.
+    df["Revenue"] = (
+        df[QUANTITY_COL].to_numpy(dtype=np.float64)
+        * df[UNIT_PRICE_COL].to_numpy(dtype=np.float64)
+    ).astype(np.float32)
+
+    return df
+
+
+def _uses_polars(uploaded_file) -> bool:
+    """
+    Whether load_transactions reads this upload with the Polars backend.
+    """
+    return USE_POLARS and pl is not None and uploaded_file.name.lower().endswith(".csv")
+
+
+def load_transactions(uploaded_file) -> pd.DataFrame:
+    """
+    Loads and lightly cleans an e-commerce transactions dataset.
+
+    Not cached itself; use get_transactions, which persists the result so
+    the file is only loaded and processed once.
+    """
+    if _uses_polars(uploaded_file):
+        df = _load_csv_polars(uploaded_file)
+    else:
+        df = _clean_transactions(_read_any_file(uploaded_file))
+
+    # Categorical keys let groupby use integer codes instead of hashing strings.
+    for col in (COUNTRY_COL, DESCRIPTION_COL):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
+    return df
+
+
+def _evict_cache_files(cache_dir: str, keep: int):
+    """
+    Deletes all but the ``keep`` most recently used Arrow cache files.
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.startswith("transactions_") and name.endswith(".arrow"):
+            path = os.path.join(cache_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                # Removed by another session in the meantime.
+                pass
+    entries.sort(reverse=True)
+    for _, path in entries[max(keep, 1):]:
+        try:
+            os.remove(path)
+        except OSError:
+            # Still open by another session (on Windows) or already removed.
+            pass
+
 
-    # Filter obviously bad rows if needed
-    df = df[df["Revenue"].notna()]
+def get_transactions(uploaded_file, file_hash: str) -> pd.DataFrame:
+    """
+    Returns the cleaned transactions for an upload, parsing it only once.
+
+    The cleaned frame is stored as an uncompressed Arrow IPC file in
+    TRANSACTIONS_CACHE_DIR, and later calls (from any session) memory-map it
+    instead of re-parsing the upload. The file name includes the cache format
+    version and the loading backend as well as ``file_hash``, so files written
+    by older cleaning code or by the other backend are never reused. Files
+    are written to a temporary name and atomically renamed into place; an
+    unreadable file is rebuilt. Only the TRANSACTIONS_CACHE_MAX_FILES most
+    recently used files are kept.
+
+    Args:
+        uploaded_file: File object returned by st.file_uploader.
+        file_hash (str): Content digest of the uploaded file.
+
+    Returns:
+        pd.DataFrame: Cleaned transactions with a "Revenue" column.
+    """
+    backend = "polars" if _uses_polars(uploaded_file) else "pandas"
+    cache_dir = TRANSACTIONS_CACHE_DIR
+    cache_path = os.path.join(
+        cache_dir, f"transactions_v{_CACHE_FORMAT_VERSION}_{backend}_{file_hash}.arrow"
+    )
+    if os.path.exists(cache_path):
+        try:
+            df = feather.read_table(cache_path, memory_map=True).to_pandas()
+        except (OSError, pa.ArrowException):
+            # Corrupt or truncated file: drop it and rebuild below.
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+        else:
+            # Mark as recently used for eviction.
+            try:
+                os.utime(cache_path)
+            except OSError:
+                pass
+            return df
 
-    return df
\ No newline at end of file
+    df = load_transactions(uploaded_file)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".arrow.tmp")
+    os.close(fd)
+    try:
+        feather.write_feather(
+            pa.Table.from_pandas(df, preserve_index=False),
+            tmp_path,
+            compression="uncompressed",
+        )
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    _evict_cache_files(cache_dir, TRANSACTIONS_CACHE_MAX_FILES)
+    return df
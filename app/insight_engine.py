@@ -44,7 +44,7 @@ def _format_summary_for_prompt(summary: Dict[str, Any]) -> str:
         revenue = a["Revenue"]
         score = a["anomaly_score"]
         anomaly_lines.append(
-            f"- {date_str}: revenue {revenue:.2f} (IsolationForest score={score:.3f})"
+            f"- {date_str}: revenue {revenue:.2f} (anomaly score={score:.3f})"
         )
 
     text = f"""
@@ -69,7 +69,7 @@ Recent weekly revenue trend:
 Detected anomalies in revenue (based on rolling z-scores):
 {chr(10).join(anomaly_lines) if anomaly_lines else 'No anomalies detected.'}
 
-[Analyst's Note on Anomalies: Isolation Forest scores are provided. A score closer to -1.0 indicates a *strong* anomaly.
+[Analyst's Note on Anomalies: Anomaly scores are provided. A score closer to -1.0 indicates a *strong* anomaly.
 Scores closer to 0 (e.g., -0.05) are *mild* deviations. Use your judgment to distinguish between minor fluctuations and business-critical issues.]
 
 ---
@@ -1,8 +1,9 @@
+import hashlib
 import streamlit as st
 import pandas as pd
 from config import APP_TITLE, APP_DESCRIPTION
-from data_loader import load_transactions
-from analysis import build_summary, aggregate_weekly_revenue
+from data_loader import get_transactions
+from analysis import build_summary
 from insight_engine import generate_insights
 import plotly.express as px
 import plotly.graph_objects as go
@@ -57,16 +58,25 @@ def main():
 
     # --- Data Loading and Analysis ---
     try:
+        # Key the loader and analysis caches on the file content so reruns
+        # do not re-hash the whole DataFrame. The digest is computed once per
+        # upload and reused until a different file is uploaded.
+        if st.session_state.get("upload_file_id") != uploaded_file.file_id:
+            st.session_state["upload_file_hash"] = hashlib.blake2b(
+                uploaded_file.getvalue(), digest_size=16
+            ).hexdigest()
+            st.session_state["upload_file_id"] = uploaded_file.file_id
+        file_hash = st.session_state["upload_file_hash"]
+
         # Load and clean uploaded data.
-        df = load_transactions(uploaded_file)
+        df = get_transactions(uploaded_file, file_hash)
         if df.empty:
             st.error("File loaded, but no data was found or parsed.")
             return
 
-        # Aggregate weekly revenue.
-        weekly_df = aggregate_weekly_revenue(df)
-        # Build summary with anomaly detection.
-        summary = build_summary(df, contamination_rate)
+        # Build summary with weekly revenue and anomaly detection.
+        summary = build_summary(df, contamination_rate, cache_key=file_hash)
+        weekly_df = summary["weekly_df"]
 
     except Exception as e:
         st.error(f"An error occurred during data processing: {e}")
@@ -138,9 +148,9 @@ def main():
 
         # Add the anomaly markers if any.
         if not anomalies_df.empty:
-            anomalies_df['Date'] = pd.to_datetime(anomalies_df['Date']).dt.strftime("%Y-%m-%d")
+            anomalies_df['Date'] = summary["anomalies_str_dates"]
             fig.add_trace(go.Scatter(
-                x=anomalies_df['Date'],
+                x=summary["anomalies_str_dates"],
                 y=anomalies_df['Revenue'],
                 mode='markers',
                 marker=dict(color='red', size=12, symbol='x'),
@@ -192,7 +202,9 @@ def main():
     # --- Tab 3: Preview Uploaded Data ---
     with tab2:
         st.header("Raw Data Preview")
-        st.dataframe(df)
+        # Only send a preview to the browser; the full frame can be millions of rows.
+        st.dataframe(df.head(1000), hide_index=True)
+        st.caption(f"Showing first {min(len(df), 1000):,} of {len(df):,} rows.")
 
         st.header("Anomalies Data")
         if not anomalies_df.empty: